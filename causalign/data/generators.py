@@ -17,6 +17,7 @@ from torch.utils.data import Dataset
 from transformers import DistilBertTokenizer, AutoTokenizer
 import concurrent 
 import warnings 
+import hashlib
 from causalign.constants import HF_TOKEN, DISTILBERT_SUPPORTED_MODELS
 
 # ============ Helper functions for parallel tokenization ============
@@ -60,6 +61,74 @@ def tokenize_texts(texts: List[str],
         ))
                         
     return encodings
+
+def encodings_to_arrays(encodings: List, vocab_size: int):
+    """ 
+    Stack per-text encodings (each padded to max_length) into fixed-length arrays.
+    Token ids are stored as int16 when the vocabulary fits (e.g. DistilBERT), else 
+    int32 (e.g. LLaMA); attention masks as int8.
+    
+    Returns:
+    - input_ids: np.ndarray of shape (num_texts, max_length)
+    - attention_mask: np.ndarray of shape (num_texts, max_length)
+    """
+    ids_dtype = np.int16 if vocab_size <= np.iinfo(np.int16).max + 1 else np.int32
+    input_ids = np.concatenate([encoding['input_ids'].numpy() for encoding in encodings]).astype(ids_dtype)
+    attention_mask = np.concatenate([encoding['attention_mask'].numpy() for encoding in encodings]).astype(np.int8)
+    return input_ids, attention_mask
+
+def save_array_atomic(path: str, array: np.ndarray):
+    """ 
+    np.save to a temporary file, then rename it into place, so concurrent readers 
+    (e.g. other ranks under torchrun) never see a partially written array.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+def load_or_tokenize(texts: List[str], 
+                    tokenizer: DistilBertTokenizer, 
+                    args, 
+                    cache_name: str):
+    """ 
+    Tokenize texts into fixed-length arrays (see encodings_to_arrays). If 
+    args.token_cache_dir is set, the arrays are saved there as .npy files keyed 
+    by a hash of the texts, model and max length, and later runs memory-map them 
+    instead of re-tokenizing.
+    
+    Args:
+    - texts: List of texts to tokenize.
+    - tokenizer: Tokenizer object to use for encoding.
+    - cache_name: Prefix for the cache files, e.g. 'train_real'.
+    
+    Returns tuple of (input_ids, attention_mask) arrays of shape (num_texts, max_seq_length).
+    """
+    cache_dir = getattr(args, "token_cache_dir", None)
+    if cache_dir is None:
+        encodings = tokenize_texts(texts = texts, tokenizer = tokenizer, args = args)
+        return encodings_to_arrays(encodings, vocab_size = len(tokenizer))
+    
+    key = hashlib.sha1()
+    key.update(f"{args.pretrained_model_name}|{args.max_seq_length}|".encode())
+    for text in texts:
+        key.update(text.encode())
+        key.update(b"\0")
+    ids_path = os.path.join(cache_dir, f"{cache_name}_{key.hexdigest()[:16]}_input_ids.npy")
+    mask_path = os.path.join(cache_dir, f"{cache_name}_{key.hexdigest()[:16]}_attention_mask.npy")
+    
+    if not (os.path.exists(ids_path) and os.path.exists(mask_path)):
+        encodings = tokenize_texts(texts = texts, tokenizer = tokenizer, args = args)
+        input_ids, attention_mask = encodings_to_arrays(encodings, vocab_size = len(tokenizer))
+        os.makedirs(cache_dir, exist_ok=True)
+        save_array_atomic(ids_path, input_ids)
+        save_array_atomic(mask_path, attention_mask)
+        print(f"Saved tokenized {cache_name} texts to {cache_dir}")
+    else:
+        print(f"Loading tokenized {cache_name} texts from {cache_dir}")
+    
+    # copy-on-write memory map: pages are shared with the OS cache (and DataLoader workers) until written
+    return np.load(ids_path, mmap_mode='c'), np.load(mask_path, mmap_mode='c')
 # =============================================================================     
         
 class SimilarityDataset(Dataset):
@@ -145,17 +214,23 @@ class SimilarityDataset(Dataset):
         # =============================================================================
         
         # ====== Produce encodings in parallel and cache =======
+        # stored as fixed-length (num_texts, max_seq_length) arrays so batching is a single stack
         print("Tokenizing texts for real, treated, and control counterfactuals...")
-        self.encodings_real = tokenize_texts(texts = self.texts, 
-                                        tokenizer = self.tokenizer, 
-                                        args = args)
+        self.input_ids_real, self.attention_mask_real = load_or_tokenize(texts = self.texts, 
+                                                                        tokenizer = self.tokenizer, 
+                                                                        args = args,
+                                                                        cache_name = f"{split}_real")
+        self.input_ids_treated, self.attention_mask_treated = None, None
+        self.input_ids_control, self.attention_mask_control = None, None
         if split == 'train':
-            self.encodings_treated = tokenize_texts(texts = self.texts_treated,
-                                                    tokenizer = self.tokenizer,
-                                                    args = args)
-            self.encodings_control = tokenize_texts(texts = self.texts_control,
-                                                    tokenizer = self.tokenizer,
-                                                    args = args)
+            self.input_ids_treated, self.attention_mask_treated = load_or_tokenize(texts = self.texts_treated,
+                                                                                tokenizer = self.tokenizer,
+                                                                                args = args,
+                                                                                cache_name = f"{split}_treated")
+            self.input_ids_control, self.attention_mask_control = load_or_tokenize(texts = self.texts_control,
+                                                                                tokenizer = self.tokenizer,
+                                                                                args = args,
+                                                                                cache_name = f"{split}_control")
             
     
     # ======== Create treated and control counterfactuals for each example ========
@@ -364,25 +439,20 @@ class SimilarityDataset(Dataset):
         control_text = str(self.texts_control[idx] if self.texts_control else None)
         target = self.targets[idx]
 
-        encoding_real = self.encodings_real[idx]
-
-        encoding_treated = None
-        encoding_control = None
-        if self.split == 'train':
-            encoding_treated = self.encodings_treated[idx] if self.encodings_treated else None
-            encoding_control = self.encodings_control[idx] if self.encodings_control else None
+        def row(array):
+            return torch.from_numpy(array[idx]) if array is not None else None  # zero-copy view of the stored row
             
         output = {
             'text': text,
             'treated_text': treated_text,
             'control_text': control_text,
             'target': target,
-            'input_ids_real': encoding_real['input_ids'],
-            'input_ids_treated': encoding_treated.get('input_ids') if encoding_treated else None,
-            'input_ids_control': encoding_control.get('input_ids') if encoding_control else None,
-            'attention_mask_real': encoding_real['attention_mask'],
-            'attention_mask_treated': encoding_treated.get('attention_mask') if encoding_treated else None,
-            'attention_mask_control': encoding_control.get('attention_mask') if encoding_control else None
+            'input_ids_real': row(self.input_ids_real),
+            'input_ids_treated': row(self.input_ids_treated),
+            'input_ids_control': row(self.input_ids_control),
+            'attention_mask_real': row(self.attention_mask_real),
+            'attention_mask_treated': row(self.attention_mask_treated),
+            'attention_mask_control': row(self.attention_mask_control)
         }
 
         return output
@@ -400,7 +470,10 @@ class SimilarityDataset(Dataset):
             raise TypeError(f"Invalid argument type: {type(key)}. Must be int or slice.")
         
     def collate_fn(batch):
-        """Custom collate function for batching. Ensures equal padding for torch modules."""
+        """
+        Custom collate function for batching. Rows are already padded to max_seq_length, 
+        so this is a stack plus a cast back to the int64 ids/masks the backbones expect.
+        """
         collated_data = {}
 
         for prefix in ['real', 'treated', 'control']:
@@ -409,12 +482,8 @@ class SimilarityDataset(Dataset):
 
             # Check if data for the current prefix exists
             if batch[0][input_ids_key] is not None:
-                collated_data[input_ids_key] = torch.nn.utils.rnn.pad_sequence(
-                    [item[input_ids_key].squeeze(0) for item in batch], batch_first=True
-                )
-                collated_data[attention_mask_key] = torch.nn.utils.rnn.pad_sequence(
-                    [item[attention_mask_key].squeeze(0) for item in batch], batch_first=True
-                )
+                collated_data[input_ids_key] = torch.stack([item[input_ids_key] for item in batch]).long()
+                collated_data[attention_mask_key] = torch.stack([item[attention_mask_key] for item in batch]).long()
             else:
                 collated_data[input_ids_key] = None
                 collated_data[attention_mask_key] = None
@@ -11,6 +11,8 @@ class CausalSent(torch.nn.Module):
                 pretrained_model_name: str,
                 sentiment_head_type = 'fcn', # 'fcn', 'linear', 'conv'
                 riesz_head_type = 'fcn', # 'fcn', 'linear', 'conv'
+                use_gradient_checkpointing: bool = True,
+                print_info: bool = True,
                 ):
         """ 
         Causal Sentence Embedding Model.
@@ -22,24 +24,41 @@ class CausalSent(torch.nn.Module):
             Type of sentiment head to use. Options: 'fcn', 'linear', 'conv'
         - riesz_head_type: str, default='fcn'
             Type of Riesz head to use. Options: 'fcn', 'linear', 'conv'
+        - use_gradient_checkpointing: bool, default=True
+            Recompute backbone activations during backward instead of storing 
+            them. Trades one extra backbone forward for much lower activation 
+            memory across the real/treated/control passes. The heads are not 
+            checkpointed: they are small, and re-running the BatchNorm in 'conv' 
+            heads would update its running statistics twice per step.
+        - print_info: bool, default=True
+            Print the model / unfreezing banners. Disabled on non-zero ranks 
+            under distributed training.
         """
         
         super().__init__()
         self.sentiment_head_type = sentiment_head_type
         self.riesz_head_type = riesz_head_type
+        self.use_gradient_checkpointing = use_gradient_checkpointing
+        self.print_info = print_info
+        # whether any head consumes the pooled (CLS / last-token) embedding rather than the sequence
+        self._needs_pool = riesz_head_type in ['fcn', 'linear'] or sentiment_head_type in ['fcn', 'linear']
+        # whether any head consumes the full sequence ('conv', in channels-first layout)
+        self._needs_seq = riesz_head_type == 'conv' or sentiment_head_type == 'conv'
         
         # =========== Load backbone (DistilBERT or LLaMA) =================
         if not pretrained_model_name in SUPPORTED_BACKBONES_LIST:
             warnings.warn(f"[WARNING] Unsupported/tested model name: {pretrained_model_name}. ")
-            print(f"Supported models: {SUPPORTED_BACKBONES_LIST}")
+            self._print(f"Supported models: {SUPPORTED_BACKBONES_LIST}")
             
         if "bert" in pretrained_model_name:
             self.backbone = DistilBertModel.from_pretrained(pretrained_model_name, token=HF_TOKEN)
             backbone_type = "DistilBERT"
+            self._pool_idx = 0  # CLS token embedding
         elif "llama" in pretrained_model_name:
             # Example: Uncomment below if LLaMA 3.1 8B is desired
             self.backbone = LlamaModel.from_pretrained(pretrained_model_name, token=HF_TOKEN)
             backbone_type = "LLaMA"
+            self._pool_idx = -1  # Last token embedding
         else:
             raise ValueError(f"[ERROR] Unsupported model name: {pretrained_model_name}. "
                             f"Expected 'bert' or 'llama' in the name.")
@@ -47,16 +66,31 @@ class CausalSent(torch.nn.Module):
         backbone_hidden_size = self.backbone.config.hidden_size
         self.backbone_hidden_size = backbone_hidden_size
 
+        # Cache the top-level transformer layers for (iterative) unfreezing. Kept as a plain 
+        # tuple rather than a module attribute so they are not registered twice in the state_dict
+        encoder = getattr(self.backbone, "encoder", getattr(self.backbone, "transformer", None))
+        encoder_layers = encoder.layer if encoder is not None else getattr(self.backbone, "layers", None)  # LLaMA has no encoder wrapper
+        if encoder_layers is None:
+            raise AttributeError("The backbone model does not have an 'encoder', 'transformer' or 'layers' attribute.")
+        self._encoder_layers = tuple(encoder_layers)
+        self._n_encoder_layers = len(self._encoder_layers)
+
+        # HF models only checkpoint their layers when in training mode, so eval is unaffected
+        if use_gradient_checkpointing:
+            self.backbone.config.use_cache = False  # kv cache is incompatible with checkpointing
+            self.backbone.gradient_checkpointing_enable(gradient_checkpointing_kwargs={"use_reentrant": False})
+
         # Freeze backbone parameters initially
         for param in self.backbone.parameters():
             param.requires_grad = False
 
         # Print backbone model information
-        print("\n" + "=" * 50)
-        print(f"Loaded Backbone Model: {backbone_type}")
-        print(f"Pretrained Model Name: {pretrained_model_name}")
-        print(f"Backbone Hidden Size: {backbone_hidden_size}")
-        print("=" * 50 + "\n")
+        self._print("\n" + "=" * 50)
+        self._print(f"Loaded Backbone Model: {backbone_type}")
+        self._print(f"Pretrained Model Name: {pretrained_model_name}")
+        self._print(f"Backbone Hidden Size: {backbone_hidden_size}")
+        self._print(f"Gradient Checkpointing: {use_gradient_checkpointing}")
+        self._print("=" * 50 + "\n")
 
         def initialize_weights(module):
             """
@@ -93,6 +127,62 @@ class CausalSent(torch.nn.Module):
         self.sentiment.apply(initialize_weights)
         for param in self.sentiment.parameters():
             param.requires_grad = True
+
+    def _print(self, *args):
+        """print, unless the model was built with print_info=False."""
+        if self.print_info:
+            print(*args)
+
+    def _pool(self, last_hidden_state: torch.Tensor) -> torch.Tensor:
+        """
+        Pool a (batch, seq, hidden) backbone output to a single embedding per example 
+        (CLS token for DistilBERT, last token for LLaMA).
+        """
+        return last_hidden_state[:, self._pool_idx, :]
+
+    def _channels_first(self, last_hidden_state: torch.Tensor) -> torch.Tensor:
+        """
+        Lay out a (batch, seq, hidden) backbone output as a contiguous (batch, hidden, seq) 
+        tensor for the Conv1d-based 'conv' heads. Done once here so the layout copy is 
+        shared by both heads instead of happening implicitly inside each.
+        """
+        return last_hidden_state.transpose(1, 2).contiguous()
+
+    def _stack_branches(self, input_ids_list: list, attention_mask_list: list) -> tuple:
+        """
+        Concatenate the real/treated/control inputs along the batch dimension. 
+        SimilarityDataset already pads every branch to max_seq_length; right-padding 
+        to a common length is only a fallback for callers passing branches of 
+        different lengths.
+        """
+        max_len = max(ids.size(1) for ids in input_ids_list)
+        if any(ids.size(1) != max_len for ids in input_ids_list):
+            pad_token_id = self.backbone.config.pad_token_id or 0
+            input_ids_list = [torch.nn.functional.pad(ids, (0, max_len - ids.size(1)), value=pad_token_id) 
+                              for ids in input_ids_list]
+            attention_mask_list = [torch.nn.functional.pad(mask, (0, max_len - mask.size(1)), value=0) 
+                                   for mask in attention_mask_list]
+        return torch.cat(input_ids_list, dim=0), torch.cat(attention_mask_list, dim=0)
+            
+    def _branch_head(self, 
+                    head: torch.nn.Module, 
+                    head_type: str, 
+                    seq: torch.Tensor, 
+                    pooled: torch.Tensor, 
+                    batch_size: int) -> tuple:
+        """
+        Apply a head to the stacked real/treated/control backbone output and split 
+        the result back into (real, treated, control). Pooled heads ('fcn', 'linear') 
+        run once on the stacked batch. 'conv' heads contain BatchNorm, so they run 
+        per branch to keep each branch's batch statistics separate, and expect the 
+        channels-first sequence `seq` (see _channels_first).
+        """
+        if head_type in ['fcn', 'linear']: # Pass pooled embeddings to fcn or linear
+            return head(pooled).split(batch_size, dim=0)
+        elif head_type == 'conv': # pass sequence of embeddings to conv
+            return tuple(head(seq_branch) for seq_branch in seq.split(batch_size, dim=0))
+        else:
+            raise ValueError(f"[ERROR] Unsupported head type: {head_type}.")
             
     def percentage_trainable_params(self):
         """         
@@ -125,12 +215,7 @@ class CausalSent(torch.nn.Module):
         """
         eps = 1e-2
         
-        encoder = getattr(self.backbone, "encoder", getattr(self.backbone, "transformer", None))
-        
-        if encoder is None:
-            raise AttributeError("The backbone model does not have an 'encoder' or 'transformer' attribute.")
-            
-        total_backbone_layers = len(list(encoder.layer))
+        total_backbone_layers = self._n_encoder_layers
         
         num_layers = None
         if fraction > 1.0 - eps:
@@ -156,47 +241,68 @@ class CausalSent(torch.nn.Module):
         if isinstance(num_layers, int) and num_layers <= 0:  
             pass # don't unfreeze anything
         else:
-            print("\n" + "=" * 50)
-            print("Unfreezing Backbone Layers:")
-
-            encoder = getattr(self.backbone, "encoder", getattr(self.backbone, "transformer", None))
-            if encoder is None:
-                raise AttributeError("The backbone model does not have an 'encoder' or 'transformer' attribute.")
+            self._print("\n" + "=" * 50)
+            self._print("Unfreezing Backbone Layers:")
 
             if num_layers == 'all':
                 for param in self.backbone.parameters():
                     param.requires_grad = True
-                print("  > All layers have been unfrozen.\n(This includes e.g. embeddings prior to the DistilBERT tranformer if using DistilBERT.)")
+                self._print("  > All layers have been unfrozen.\n(This includes e.g. embeddings prior to the DistilBERT tranformer if using DistilBERT.)")
             else:
                 # Unfreeze the last `num_layers` layers
                 assert isinstance(num_layers, int), "num_layers must be 'all' or an integer."
-                layer_list = list(encoder.layer)  # List of layers
-                layers_to_unfreeze = layer_list[-num_layers:]   # would break with non-positive ints, but we check that above
+                layers_to_unfreeze = self._encoder_layers[-num_layers:]   # would break with non-positive ints, but we check that above
 
                 for layer in layers_to_unfreeze:
                     for param in layer.parameters():
                         param.requires_grad = True
-                print(f"  > Last {num_layers} backbone layers have been unfrozen (transformer/encoder layers).")
+                self._print(f"  > Last {num_layers} backbone layers have been unfrozen (transformer/encoder layers).")
 
             # Verbose unfreezing output
             if verbose:
                 for name, param in self.backbone.named_parameters():
                     if param.requires_grad:
-                        print(f"    - Unfrozen: {name}")
+                        self._print(f"    - Unfrozen: {name}")
 
             total_params = sum(p.numel() for p in self.backbone.parameters())
             trainable_params_after = sum(p.numel() for p in self.backbone.parameters() if p.requires_grad)
             trainable_percentage = (trainable_params_after / total_params) * 100
 
-            print(f"\nBackbone Parameters Summary:")
-            print(f"  > Total Parameters: {total_params:,}")
-            print(f"  > Trainable Parameters (After Unfreezing): {trainable_params_after:,}")
-            print(f"  > Percentage Trainable: {trainable_percentage:.2f}%")
-            print("=" * 50 + "\n")
+            self._print(f"\nBackbone Parameters Summary:")
+            self._print(f"  > Total Parameters: {total_params:,}")
+            self._print(f"  > Trainable Parameters (After Unfreezing): {trainable_params_after:,}")
+            self._print(f"  > Percentage Trainable: {trainable_percentage:.2f}%")
+            self._print("=" * 50 + "\n")
         
         return {"trainable_model": self.percentage_trainable_params(),
                 "trainable_backbone": self.percentage_trainable_backbone_params()}
 
+    def build_frozen_inference_module(self, 
+                                    example_input_ids: torch.Tensor, 
+                                    example_attention_mask: torch.Tensor) -> torch.jit.ScriptModule:
+        """ 
+        Trace and freeze the backbone -> pooling -> sentiment head inference path 
+        with TorchScript. Freezing inlines the current weights and head-type 
+        dispatch as constants, so the module must be rebuilt whenever the 
+        weights change (i.e. after every training epoch).
+        
+        Parameters:
+        - example_input_ids: torch.Tensor
+            Example batch of input ids on the target device, used for tracing.
+        - example_attention_mask: torch.Tensor
+            Example batch of attention masks on the target device, used for tracing.
+            
+        Returns the frozen torch.jit.ScriptModule mapping (input_ids, attention_mask) to sentiment logits.
+        """
+        was_training = self.training
+        self.eval()  # freezing requires eval mode
+        inference_module = CausalSentInference(self).eval()  # a fresh module starts in training mode
+        with torch.no_grad():
+            traced = torch.jit.trace(inference_module, (example_input_ids, example_attention_mask))
+        frozen = torch.jit.freeze(traced)
+        self.train(was_training)
+        return frozen
+
     def forward(self,
                 input_ids_real, 
                 input_ids_treated, 
@@ -205,47 +311,36 @@ class CausalSent(torch.nn.Module):
                 attention_mask_treated, 
                 attention_mask_control)-> Union[torch.Tensor, tuple]:
         
-        if self.training:
-            backbone_output_real = self.backbone(input_ids_real, attention_mask=attention_mask_real)
-            backbone_output_treated = self.backbone(input_ids_treated, attention_mask=attention_mask_treated)
-            backbone_output_control = self.backbone(input_ids_control, attention_mask=attention_mask_control)
+        if self.training and (input_ids_treated is None or input_ids_control is None):
+            # No counterfactual branches (causal losses disabled): real branch through the sentiment head only
+            hidden = self.backbone(input_ids_real, attention_mask=attention_mask_real).last_hidden_state
+            pooled = self._pool(hidden) if self._needs_pool else None
+            seq = self._channels_first(hidden) if self.sentiment_head_type == 'conv' else None
+            (sentiment_output_real,) = self._branch_head(
+                self.sentiment, self.sentiment_head_type, seq, pooled, hidden.size(0))
+            
+            return (sentiment_output_real, None, None, None, None, None)
+        elif self.training:
+            # Single backbone call over the stacked real/treated/control batch. 
+            # Same FLOPs as three calls, but a third of the kernel launches
+            batch_size = input_ids_real.size(0)
+            input_ids, attention_mask = self._stack_branches(
+                [input_ids_real, input_ids_treated, input_ids_control],
+                [attention_mask_real, attention_mask_treated, attention_mask_control]
+            )
+            backbone_output = self.backbone(input_ids, attention_mask=attention_mask)
+            hidden = backbone_output.last_hidden_state  # (3 * batch, seq, hidden)
 
             # Produce single embedding for FCN or linear layers 
             # Retain sequence otherwise 
-            if self.riesz_head_type in ['fcn', 'linear'] or self.sentiment_head_type in ['fcn', 'linear']:
-                if isinstance(self.backbone, DistilBertModel):
-                    embedding_real = backbone_output_real.last_hidden_state[:, 0, :]  # CLS token embedding
-                    embedding_treated = backbone_output_treated.last_hidden_state[:, 0, :]
-                    embedding_control = backbone_output_control.last_hidden_state[:, 0, :]
-                elif isinstance(self.backbone, LlamaModel):
-                    embedding_real = backbone_output_real.last_hidden_state[:, -1, :]  # Last token embedding
-                    embedding_treated = backbone_output_treated.last_hidden_state[:, -1, :]
-                    embedding_control = backbone_output_control.last_hidden_state[:, -1, :]
-                else:
-                    raise ValueError("[ERROR] Unsupported backbone model.")
+            pooled = self._pool(hidden) if self._needs_pool else None  # (3 * batch, hidden)
+            seq = self._channels_first(hidden) if self._needs_seq else None  # (3 * batch, hidden, seq)
 
             # =========== Produce RR and Sentiment Outputs ===========
-            if self.riesz_head_type in ['fcn', 'linear']: # Pass pooled embeddings to fcn or linear
-                riesz_output_real = self.riesz(embedding_real)
-                riesz_output_treated = self.riesz(embedding_treated)
-                riesz_output_control = self.riesz(embedding_control)
-            elif self.riesz_head_type == 'conv':  # pass sequence of embeddings to conv
-                riesz_output_real = self.riesz(backbone_output_real.last_hidden_state)
-                riesz_output_treated = self.riesz(backbone_output_treated.last_hidden_state)
-                riesz_output_control = self.riesz(backbone_output_control.last_hidden_state)
-            else:
-                raise ValueError(f"[ERROR] Unsupported Riesz head type: {self.riesz_head_type}.")
-                
-            if self.sentiment_head_type in ['fcn', 'linear']: # Pass pooled embeddings to fcn or linear
-                sentiment_output_real = self.sentiment(embedding_real)
-                sentiment_output_treated = self.sentiment(embedding_treated)
-                sentiment_output_control = self.sentiment(embedding_control)
-            elif self.sentiment_head_type == 'conv': # pass sequence of embeddings to conv
-                sentiment_output_real = self.sentiment(backbone_output_real.last_hidden_state)
-                sentiment_output_treated = self.sentiment(backbone_output_treated.last_hidden_state)
-                sentiment_output_control = self.sentiment(backbone_output_control.last_hidden_state)
-            else:
-                raise ValueError(f"[ERROR] Unsupported sentiment head type: {self.sentiment_head_type}.")
+            riesz_output_real, riesz_output_treated, riesz_output_control = self._branch_head(
+                self.riesz, self.riesz_head_type, seq, pooled, batch_size)
+            sentiment_output_real, sentiment_output_treated, sentiment_output_control = self._branch_head(
+                self.sentiment, self.sentiment_head_type, seq, pooled, batch_size)
 
             return (sentiment_output_real, sentiment_output_treated, sentiment_output_control, 
                     riesz_output_real, riesz_output_treated, riesz_output_control)
@@ -255,14 +350,9 @@ class CausalSent(torch.nn.Module):
             embedding_real = None
             embeddings_real = None
             if self.sentiment_head_type in ['fcn', 'linear']: # Pass pooled embeddings to fcn or linear
-                if isinstance(self.backbone, DistilBertModel):
-                    embedding_real = backbone_output_real.last_hidden_state[:, 0, :]  # CLS token embedding
-                elif isinstance(self.backbone, LlamaModel):
-                    embedding_real = backbone_output_real.last_hidden_state[:, -1, :]  # Last token embedding
-                else:
-                    raise ValueError("[ERROR] Unsupported backbone model.")
+                embedding_real = self._pool(backbone_output_real.last_hidden_state)
             elif self.sentiment_head_type == 'conv': # pass sequence of embeddings to conv
-                embeddings_real = backbone_output_real.last_hidden_state
+                embeddings_real = self._channels_first(backbone_output_real.last_hidden_state)
             else:
                 raise ValueError(f"[ERROR] Unsupported sentiment head type: {self.sentiment_head_type}.")
             
@@ -274,4 +364,26 @@ class CausalSent(torch.nn.Module):
             else:
                 raise ValueError("[ERROR] No valid embeddings found for sentiment head.")
 
-            return sentiment_output_real
\ No newline at end of file
+            return sentiment_output_real
+
+
+class CausalSentInference(torch.nn.Module):
+    def __init__(self, model: CausalSent):
+        """ 
+        Inference-only view of a CausalSent model (backbone, pooling, sentiment head)
+        without the Riesz head or training branches, so it can be traced by TorchScript.
+        Shares parameters with `model`.
+        """
+        super().__init__()
+        self.backbone = model.backbone
+        self.sentiment = model.sentiment
+        self.pool = model.sentiment_head_type in ['fcn', 'linear']
+        self.pool_index = model._pool_idx
+
+    def forward(self, input_ids, attention_mask):
+        hidden = self.backbone(input_ids, attention_mask=attention_mask, return_dict=False)[0]
+        if self.pool:
+            hidden = hidden[:, self.pool_index, :]
+        else:
+            hidden = hidden.transpose(1, 2).contiguous()  # 'conv' heads take (batch, hidden, seq)
+        return self.sentiment(hidden)
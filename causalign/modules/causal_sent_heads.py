@@ -1,17 +1,5 @@
 import torch
 
-class Lambda(torch.nn.Module):
-    """
-    A simple Lambda layer for inline tensor transformations. Needed for 
-    dummy channel dimension in 'conv' layer.
-    """
-    def __init__(self, func):
-        super(Lambda, self).__init__()
-        self.func = func
-
-    def forward(self, x):
-        return self.func(x)
-
 def get_head(backbone_hidden_size: int,
             head_hidden_size: int,
             head_type: str,
@@ -47,8 +35,10 @@ def get_head(backbone_hidden_size: int,
         )
     elif head_type == 'conv':
         head = torch.nn.Sequential(
-            # Expect input shape: (batch_size, sequence_length, hidden_size)
-            Lambda(lambda x: x.transpose(1, 2)),  # Transpose for Conv1d: (batch_size, hidden_size, sequence_length)
+            # Expect contiguous channels-first input: (batch_size, hidden_size, sequence_length).
+            # The caller transposes once (shared by both heads); the Identity keeps the layer 
+            # indices of checkpoints saved when the transpose lived here
+            torch.nn.Identity(),
             torch.nn.Conv1d(backbone_hidden_size, head_hidden_size, kernel_size=3, padding=1),
             torch.nn.BatchNorm1d(head_hidden_size),
             torch.nn.ReLU(),
@@ -78,7 +68,7 @@ class RieszHead(torch.nn.Module):
         """ 
         Output Riesz Representers from the backbone embedding.
         Note that the embedding can be either pooled ('fcn' or 'linear' Riesz uses CLS or last-token pooled embedding), 
-        or sequence ('conv' Riesz uses sequence of embeddings).
+        or sequence ('conv' Riesz uses sequence of embeddings, shaped (batch, hidden, seq)).
         """
         output = self.head(backbone_embedding)
         return output
@@ -100,7 +90,7 @@ class SentimentHead(torch.nn.Module):
         """ 
         Output sentiment predictions from the backbone embedding.
         Note that the embedding can be either pooled ('fcn' or 'linear' Riesz uses CLS or last-token pooled embedding), 
-        or sequence ('conv' Riesz uses sequence of embeddings).
+        or sequence ('conv' Riesz uses sequence of embeddings, shaped (batch, hidden, seq)).
         """
         out = self.head(backbone_embedding)
         if self.probs: 
@@ -5,11 +5,15 @@ sentiment analysis. CausalSent.
 
 import os
 import sys
+import warnings
+import contextlib
 TOP_DIR = os.path.abspath(os.path.join(os.getcwd(), '..'))
 if TOP_DIR not in sys.path:
     sys.path.insert(0, TOP_DIR)
 import torch
 from torch.utils.data import DataLoader
+from torch.utils.data.distributed import DistributedSampler
+from torch.nn.parallel import DistributedDataParallel
 from torch.amp import autocast, GradScaler
 from sklearn.metrics import accuracy_score, f1_score
 from causalign.data.utils import load_imdb_data, load_civil_comments_data
@@ -20,9 +24,73 @@ from causalign.utils import (save_model, load_model_inference,
                     get_default_sent_training_args, seed_everything, 
                     EarlyStopper, initialize_database, save_arguments_to_db,
                     save_metrics_to_db, save_model_weights_to_db, save_outputs_to_db,
-                    process_unfreeze_param)
+                    process_unfreeze_param, metrics_from_confusion_counts)
 import wandb
 import pandas as pd
+from typing import Union
+
+
+def build_train_model(model: CausalSent, 
+                    args, 
+                    device: torch.device, 
+                    local_rank: Union[int, None]) -> torch.nn.Module:
+    """ 
+    Wrap the eager CausalSent model for the training forward pass: DistributedDataParallel 
+    when launched with torchrun, then torch.compile if requested. DDP only syncs parameters 
+    that required grad when it was constructed, so rebuild whenever layers are unfrozen. 
+    `model` itself stays the eager module for eval, unfreezing and checkpoint saving.
+    """
+    train_model = model
+    if local_rank is not None:
+        # frozen backbone params and the eval-only path contribute no grads
+        train_model = DistributedDataParallel(model, 
+                                            device_ids=[local_rank] if device.type == "cuda" else None, 
+                                            find_unused_parameters=True)
+    if args.compile:
+        if args.gradient_checkpointing:
+            warnings.warn("[WARNING] --compile is skipped when gradient checkpointing is enabled. Pass --no-gradient_checkpointing to compile.")
+        else:
+            torch._dynamo.config.cache_size_limit = 8192
+            compile_mode = "reduce-overhead" if device.type == "cuda" else "default"  # reduce-overhead uses CUDA graphs
+            train_model = torch.compile(train_model, backend="inductor", mode=compile_mode, dynamic=False)
+            if model.print_info:
+                print(f"Compiled training forward with torch.compile (mode={compile_mode})")
+    return train_model
+
+
+def predict_sentiment(model: CausalSent, 
+                    loader: DataLoader, 
+                    device: torch.device, 
+                    inference_model: Union[torch.jit.ScriptModule, None] = None):
+    """ 
+    Predict binary sentiment for every example in `loader` with the model in eval mode. 
+    Targets and predictions are written into preallocated on-device buffers and copied 
+    to host once at the end, rather than synced batch by batch. If given, `inference_model` 
+    (see CausalSent.build_frozen_inference_module) is used in place of the eager forward.
+    
+    Returns tuple of numpy arrays (targets, predictions).
+    """
+    num_examples = len(loader.dataset)
+    targets_all = torch.empty(num_examples, dtype=torch.float, device=device)
+    predictions_all = torch.empty(num_examples, dtype=torch.int8, device=device)
+    cursor = 0
+    with torch.inference_mode():
+        for batch in loader:
+            input_ids_real = batch['input_ids_real'].to(device, non_blocking=True)
+            attention_mask_real = batch['attention_mask_real'].to(device, non_blocking=True)
+            targets = batch['targets'].to(device, non_blocking=True).float()
+            
+            if inference_model is not None:
+                sentiment_output_real = inference_model(input_ids_real, attention_mask_real)
+            else:
+                sentiment_output_real = model(input_ids_real, None, None, attention_mask_real, None, None)
+            
+            batch_size = targets.size(0)
+            targets_all[cursor:cursor + batch_size] = targets
+            predictions_all[cursor:cursor + batch_size] = (sentiment_output_real.squeeze(-1) > 0).to(torch.int8)  # logit > 0 <=> prob > 0.5
+            cursor += batch_size
+            
+    return targets_all[:cursor].cpu().numpy(), predictions_all[:cursor].cpu().numpy()
 
 
 def train_causal_sent(args):
@@ -33,27 +101,48 @@ def train_causal_sent(args):
     
     project_name = args.project_name
     
+    # ====== Distributed Setup ======
+    # launched with `torchrun --nproc_per_node=N train_causal_sent.py ...` when LOCAL_RANK is set. 
+    # Each process trains on its own GPU and shard of the training data; --batch_size is per process
+    distributed: bool = "LOCAL_RANK" in os.environ
+    local_rank: Union[int, None] = None
+    if distributed:
+        local_rank = int(os.environ["LOCAL_RANK"])
+        torch.distributed.init_process_group(backend="nccl" if torch.cuda.is_available() else "gloo")
+        if torch.cuda.is_available():
+            torch.cuda.set_device(local_rank)
+    is_main: bool = not distributed or torch.distributed.get_rank() == 0  # only rank 0 logs and saves
+    
     # ====== Verbose Argument Printout ======
-    print("\n" + "="*50)
-    print("Running CausalSent Training with the following arguments:")
-    for arg, value in vars(args).items():
-        print(f"{arg}: {value}")
-    print("="*50 + "\n")
+    if is_main:
+        print("\n" + "="*50)
+        print("Running CausalSent Training with the following arguments:")
+        for arg, value in vars(args).items():
+            print(f"{arg}: {value}")
+        print("="*50 + "\n")
     
     # ====== Initialize Experiment Tracking DB ======
-    initialize_database()
-    experiment_id = save_arguments_to_db(args=args, project_name=project_name)
+    experiment_id = None
+    if is_main:
+        initialize_database()
+        experiment_id = save_arguments_to_db(args=args, project_name=project_name)
     
     # ======= Setup Tracking and Device ========
-    # Initialize wandb
-    wandb.init(project=project_name, config=args)
+    # Initialize wandb (a no-op run on non-main ranks)
+    wandb.init(project=project_name, config=args, mode=None if is_main else "disabled")
     # Device setup
-    device = torch.device("cuda" if torch.cuda.is_available() 
-                        else "mps" if torch.backends.mps.is_available() 
-                        else "cpu")
-    print(f"Using device: {device}")
-    if str(device) == "mps" and args.autocast:
-        raise ValueError("Mixed precision training not supported with MPS. Disable autocast.")
+    if distributed and torch.cuda.is_available():
+        device = torch.device("cuda", local_rank)
+    else:
+        device = torch.device("cuda" if torch.cuda.is_available() 
+                            else "mps" if torch.backends.mps.is_available() 
+                            else "cpu")
+    if is_main:
+        print(f"Using device: {device}")
+    # --autocast predates --amp_dtype and is kept as an alias for bf16
+    amp_dtype: str = "bf16" if (args.autocast and args.amp_dtype == "off") else args.amp_dtype
+    if str(device) == "mps" and amp_dtype != "off":
+        raise ValueError("Mixed precision training not supported with MPS. Disable autocast / set --amp_dtype off.")
     
     # =========== Load Data ==============
     if args.dataset == "imdb":
@@ -108,16 +197,33 @@ def train_causal_sent(args):
     pretrained_model_name: str = args.pretrained_model_name
     lr: float = args.lr
     doubly_robust: bool = args.doubly_robust # whether to use doubly robust estimation of ATE
+    use_causal: bool = lambda_reg != 0.0 or lambda_riesz != 0.0  # otherwise skip the treated/control branches entirely (pure BCE training)
     
     # DataLoaders
-    train_loader = DataLoader(ds_train, batch_size=batch_size, shuffle=True, collate_fn=SimilarityDataset.collate_fn)
-    val_loader = DataLoader(ds_val, batch_size=batch_size, collate_fn=SimilarityDataset.collate_fn)
-    test_loader = DataLoader(ds_test, batch_size=batch_size, collate_fn=SimilarityDataset.collate_fn)
+    # pinned host memory lets the non_blocking .to(device) copies below overlap with compute
+    num_workers: int = args.num_workers
+    loader_kwargs = dict(collate_fn=SimilarityDataset.collate_fn, 
+                        num_workers=num_workers, 
+                        pin_memory=device.type == "cuda",
+                        prefetch_factor=4 if num_workers > 0 else None)
+    train_sampler = DistributedSampler(ds_train, shuffle=True) if distributed else None
+    # only the train loader keeps its workers alive between epochs; val/test are iterated rarely
+    train_loader = DataLoader(ds_train, batch_size=batch_size, shuffle=train_sampler is None, sampler=train_sampler, 
+                            persistent_workers=num_workers > 0, **loader_kwargs)
+    val_loader = DataLoader(ds_val, batch_size=batch_size, **loader_kwargs)
+    test_loader = DataLoader(ds_test, batch_size=batch_size, **loader_kwargs)
 
     # Model, optimizer, and loss
     model = CausalSent(pretrained_model_name=pretrained_model_name, 
                     sentiment_head_type = args.sentiment_head_type, 
-                    riesz_head_type = args.riesz_head_type).to(device)
+                    riesz_head_type = args.riesz_head_type,
+                    use_gradient_checkpointing = args.gradient_checkpointing,
+                    print_info = is_main).to(device)
+    
+    if not use_causal:
+        # the fast path never runs the Riesz head. Its params must not get grads (e.g. via the L1 term), 
+        # or DDP, which already marked them unused, sees them become ready a second time
+        model.riesz.requires_grad_(False)  # before the %trainable summaries below, so they exclude it
     
     percent_trainable_params: dict = {
         'trainable_backbone': model.percentage_trainable_backbone_params(),
@@ -134,22 +240,52 @@ def train_causal_sent(args):
     
     # TODO: add in peft LoRA config stuff and pass to model for the backbone
     
-    optimizer = torch.optim.AdamW(model.parameters(), lr=lr)
+    # ===== DDP / torch.compile the training forward =====
+    # built after unfreezing so requires_grad is stable. Iterative unfreezing builds it at the start 
+    # of every epoch that unfreezes layers (always including the first), so skip it here
+    train_model = None
+    if args.unfreeze_backbone != "iterative":
+        train_model = build_train_model(model=model, args=args, device=device, local_rank=local_rank)
+    
+    if args.optim == "adamw8bit":
+        # 8-bit optimizer state halves optimizer memory, which matters when the full backbone is unfrozen
+        try:
+            import bitsandbytes as bnb
+        except ImportError:
+            raise ImportError("--optim adamw8bit requires bitsandbytes. Install it with `pip install bitsandbytes`.")
+        optimizer = bnb.optim.AdamW8bit(model.parameters(), lr=lr)
+    else:
+        # fused kernel applies the whole AdamW update in one launch per param group (CUDA only)
+        optimizer = torch.optim.AdamW(model.parameters(), lr=lr, fused=device.type == "cuda")
     bce_loss = torch.nn.BCEWithLogitsLoss()
 
-    # ===== scale gradients for mixed precision training =====
-    scaler = GradScaler() if args.autocast else None
+    # ===== mixed precision training =====
+    # master weights and optimizer state stay in fp32, only the forward/loss is autocast.
+    # bf16 has the fp32 exponent range, so gradients only need scaling for fp16
+    autocast_dtype = {"bf16": torch.bfloat16, "fp16": torch.float16}.get(amp_dtype, None)
+    use_autocast: bool = autocast_dtype is not None
+    scaler = GradScaler(device.type) if amp_dtype == "fp16" else None
+    
+    # example batch for tracing the frozen inference path, drawn once so the (persistent) 
+    # val_loader workers are not reset every epoch
+    example_batch = next(iter(val_loader)) if args.freeze_inference else None
     
     # ================ Training Loop =================
     early_stopper = EarlyStopper(patience=args.early_stop_patience, delta=args.early_stop_delta)
     for epoch in range(epochs):
         model.train()
-        total_loss = 0
-        train_targets, train_predictions = [], []
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch)  # reshuffle the shards every epoch
+        total_loss = torch.zeros((), device=device)
+        # on-device confusion counts; only synced to host at log time
+        train_tp = torch.zeros((), dtype=torch.long, device=device)
+        train_fp = torch.zeros((), dtype=torch.long, device=device)
+        train_fn = torch.zeros((), dtype=torch.long, device=device)
+        train_tn = torch.zeros((), dtype=torch.long, device=device)
         
-        # reset running ATE every epoch
-        running_ate_numer: float = 0 
-        running_ate_denom: float = 0
+        # reset running ATE every epoch. The numerator stays on device so updating it needs no host sync
+        running_ate_numer: torch.Tensor = torch.zeros((), device=device)
+        running_ate_denom: int = 0
         
         # ========= Iterative Unfreezing ==========
         if args.unfreeze_backbone == "iterative":
@@ -157,88 +293,94 @@ def train_causal_sent(args):
             if epoch_fraction > fraction_to_unfreeze:
                 fraction_to_unfreeze = epoch_fraction
                 percent_trainable_params = model.unfreeze_backbone_fraction(fraction_to_unfreeze)  # only unfreeze when something changes (not a bug otherwise, just waste of time)
+                train_model = build_train_model(model=model, args=args, device=device, local_rank=local_rank)
         
         for i, batch in enumerate(train_loader):
-            input_ids_real = batch['input_ids_real'].to(device)
-            input_ids_treated = batch['input_ids_treated'].to(device)
-            input_ids_control = batch['input_ids_control'].to(device)
-            attention_mask_real = batch['attention_mask_real'].to(device)
-            attention_mask_treated = batch['attention_mask_treated'].to(device)
-            attention_mask_control = batch['attention_mask_control'].to(device)
-            targets = batch['targets'].float().to(device)
+            input_ids_real = batch['input_ids_real'].to(device, non_blocking=True)
+            attention_mask_real = batch['attention_mask_real'].to(device, non_blocking=True)
+            input_ids_treated, input_ids_control, attention_mask_treated, attention_mask_control = None, None, None, None
+            if use_causal:
+                input_ids_treated = batch['input_ids_treated'].to(device, non_blocking=True)
+                input_ids_control = batch['input_ids_control'].to(device, non_blocking=True)
+                attention_mask_treated = batch['attention_mask_treated'].to(device, non_blocking=True)
+                attention_mask_control = batch['attention_mask_control'].to(device, non_blocking=True)
+            targets = batch['targets'].to(device, non_blocking=True).float().unsqueeze(-1)  # (batch, 1), matches the head outputs
             
-            optimizer.zero_grad()  # Clear gradients
+            optimizer.zero_grad(set_to_none=True)  # Clear gradients
 
-            # fwd pass
-            (sentiment_outputs_real, sentiment_outputs_treated, sentiment_outputs_control, 
-            riesz_outputs_real, riesz_outputs_treated, riesz_outputs_control) = model(
-                input_ids_real,
-                input_ids_treated,
-                input_ids_control,
-                attention_mask_real,
-                attention_mask_treated,
-                attention_mask_control,
-            )
+            # only build the autocast context when a dtype is selected; older torch rejects e.g. mps even when disabled
+            amp_context = autocast(device_type=device.type, dtype=autocast_dtype) if use_autocast else contextlib.nullcontext()
+            with amp_context:
+                # fwd pass
+                (sentiment_outputs_real, sentiment_outputs_treated, sentiment_outputs_control, 
+                riesz_outputs_real, riesz_outputs_treated, riesz_outputs_control) = train_model(
+                    input_ids_real,
+                    input_ids_treated,
+                    input_ids_control,
+                    attention_mask_real,
+                    attention_mask_treated,
+                    attention_mask_control,
+                )
 
-            # TODO: update this to use doubly robust as an option, 
-            # remove direct targets option, it should be using the estimates 
-            
-            # Compute tau_hat (estimated average treatment effect (ATE) of the 
-            # selected treatment_phrase as estimated by a riesz representation
-            # formula with RR computed via our simple implementation of RieszNet
-            
-            # note, whenever computing g (our estimate of the oracle sentiment analysis function)
-            # we must apply sigmoid to the logits, otherwise treatment effects become nonsense 
-            # in the binary sentiment domain 
-            if running_ate:
-                # Compute batch-level numerator and denominator
-                batch_numer = None
-                batch_denom = None
-                if doubly_robust:
-                    # TE_direct = g(X_i, 1) - g(X_i, 0), averaged later -> ATE_DIRECT
-                    direct_te = torch.sigmoid(sentiment_outputs_treated) - torch.sigmoid(sentiment_outputs_control)
-                    # TE_doublyrobust = TE_direct + RR(Z) * (Y - g(Z)), -> sum, -> averaged later by denom -> DR_ATE_DIRECT
-                    batch_numer = torch.sum(direct_te + riesz_outputs_real * (targets - torch.sigmoid(sentiment_outputs_real)))
-                else:
-                    # RR(Z) * g(Z)  -- r.r. ATE, not doubly robust, averaged later
-                    batch_numer = torch.sum(riesz_outputs_real * torch.sigmoid(sentiment_outputs_real))
-                    
-                batch_denom = riesz_outputs_real.size(0)  # Batch size for E_n[.]
+                if use_causal:
+                    # TODO: update this to use doubly robust as an option, 
+                    # remove direct targets option, it should be using the estimates 
+                
+                    # Compute tau_hat (estimated average treatment effect (ATE) of the 
+                    # selected treatment_phrase as estimated by a riesz representation
+                    # formula with RR computed via our simple implementation of RieszNet
+                
+                    # note, whenever computing g (our estimate of the oracle sentiment analysis function)
+                    # we must apply sigmoid to the logits, otherwise treatment effects become nonsense 
+                    # in the binary sentiment domain. g is computed once per branch and shared below
+                    probs_real = torch.sigmoid(sentiment_outputs_real)
+                    if doubly_robust:
+                        probs_treated = torch.sigmoid(sentiment_outputs_treated)
+                        probs_control = torch.sigmoid(sentiment_outputs_control)
+                    if running_ate:
+                        # Compute batch-level numerator and denominator
+                        if doubly_robust:
+                            # TE_direct = g(X_i, 1) - g(X_i, 0), averaged later -> ATE_DIRECT
+                            direct_te = probs_treated - probs_control
+                            # TE_doublyrobust = TE_direct + RR(Z) * (Y - g(Z)), -> sum, -> averaged later by denom -> DR_ATE_DIRECT
+                            batch_numer = torch.sum(direct_te + riesz_outputs_real * (targets - probs_real))
+                        else:
+                            # RR(Z) * g(Z)  -- r.r. ATE, not doubly robust, averaged later
+                            batch_numer = torch.sum(riesz_outputs_real * probs_real)
+                        
+                        batch_denom = riesz_outputs_real.size(0)  # Batch size for E_n[.]
 
-                # Update the running numerator and denominator
-                running_ate_numer += batch_numer.item()
-                running_ate_denom += batch_denom
+                        # Update the running numerator and denominator
+                        running_ate_numer += batch_numer.detach().float()
+                        running_ate_denom += batch_denom
 
-                # Recompute tau_hat as the mean
-                tau_hat = torch.Tensor([running_ate_numer / running_ate_denom]).to(device)
-            else:
-                tau_hat = None
-                if doubly_robust:
-                    # ATE_direct = E_n[g(X_i, 1), g(X_i, 0)]
-                    direct_ate = torch.mean(torch.sigmoid(sentiment_outputs_treated) - torch.sigmoid(sentiment_outputs_control))
-                    # ATE_doublyrobust = ATE_direct + E_n[RR(Z) * (Y - g(Z))]
-                    tau_hat = direct_ate + torch.mean(riesz_outputs_real * (targets - torch.sigmoid(sentiment_outputs_real)))
-                else:
-                    # E_n[RR(Z) * g_0(Z)]  -- r.r. ATE, not doubly robust
-                    tau_hat = torch.mean(riesz_outputs_real * torch.sigmoid(sentiment_outputs_real))
-            
-            if args.autocast:
-                with autocast(device_type=str(device), dtype=torch.bfloat16):  # Use autocast for MPS
+                        # Recompute tau_hat as the mean
+                        tau_hat = running_ate_numer / running_ate_denom
+                    else:
+                        if doubly_robust:
+                            # ATE_direct = E_n[g(X_i, 1), g(X_i, 0)]
+                            direct_ate = torch.mean(probs_treated - probs_control)
+                            # ATE_doublyrobust = ATE_direct + E_n[RR(Z) * (Y - g(Z))]
+                            tau_hat = direct_ate + torch.mean(riesz_outputs_real * (targets - probs_real))
+                        else:
+                            # E_n[RR(Z) * g_0(Z)]  -- r.r. ATE, not doubly robust
+                            tau_hat = torch.mean(riesz_outputs_real * probs_real)
+                
                     riesz_loss = torch.mean(-2 * (riesz_outputs_treated - riesz_outputs_control) + (riesz_outputs_real ** 2))
                     reg_loss = torch.mean(((sentiment_outputs_treated - sentiment_outputs_control) - tau_hat) ** 2)
-                    bce = bce_loss(sentiment_outputs_real.squeeze(), targets)
-                    l1_loss = sum(torch.sum(torch.abs(param)) for param in model.parameters())  # L1 loss on all model parameters
-                    loss = lambda_bce * bce + lambda_reg * reg_loss + lambda_riesz * riesz_loss + lambda_l1 * l1_loss
-            else:
-                # Compute losses without autocast
-                riesz_loss = torch.mean(-2 * (riesz_outputs_treated - riesz_outputs_control) + (riesz_outputs_real ** 2))
-                reg_loss = torch.mean(((sentiment_outputs_treated - sentiment_outputs_control) - tau_hat) ** 2)
-                bce = bce_loss(sentiment_outputs_real.squeeze(), targets)
+                else:
+                    # no Riesz representer without the counterfactual branches, so no ATE estimate
+                    tau_hat = torch.full((), float('nan'), device=device)
+                    riesz_loss = torch.zeros((), device=device)
+                    reg_loss = torch.zeros((), device=device)
+
+                bce = bce_loss(sentiment_outputs_real, targets)  # autocast runs BCEWithLogits in fp32
                 l1_loss = sum(torch.sum(torch.abs(param)) for param in model.parameters())  # L1 loss on all model parameters
                 loss = lambda_bce * bce + lambda_reg * reg_loss + lambda_riesz * riesz_loss + lambda_l1 * l1_loss
 
-            if args.autocast:
-                # scale gradients to avoid underflow/overflow if autocasting
+            # backward and optimizer step run outside autocast, on the fp32 master weights
+            if scaler is not None:
+                # scale gradients to avoid fp16 underflow/overflow
                 scaler.scale(loss).backward()
                 scaler.step(optimizer)
                 scaler.update()
@@ -246,19 +388,21 @@ def train_causal_sent(args):
                 loss.backward()
                 optimizer.step()
 
-            total_loss += loss.item()
+            total_loss += loss.detach()
 
             # =======   Logging   ========
             # Compute training metrics
-            preds = torch.sigmoid(sentiment_outputs_real).squeeze().detach().cpu().numpy()
-            # WHY IS THRESHOLD 0.5?
-            preds = (preds > 0.5).astype(int)
-            train_targets.extend(targets.cpu().numpy())
-            train_predictions.extend(preds)
+            # WHY IS THRESHOLD 0.5? (sigmoid(logit) > 0.5 <=> logit > 0)
+            pred_bool = sentiment_outputs_real.detach() > 0
+            target_bool = targets > 0.5  # same cut as the prediction, so soft labels (e.g. civil_comments toxicity) aren't all positive
+            train_tp += (pred_bool & target_bool).sum()
+            train_fp += (pred_bool & ~target_bool).sum()
+            train_fn += (~pred_bool & target_bool).sum()
+            train_tn += (~pred_bool & ~target_bool).sum()
 
             if (i + 1) % log_every == 0:
-                train_acc = accuracy_score(train_targets, train_predictions)
-                train_f1 = f1_score(train_targets, train_predictions)
+                train_acc, train_f1 = metrics_from_confusion_counts(tp=train_tp.item(), fp=train_fp.item(), 
+                                                                    fn=train_fn.item(), tn=train_tn.item())
                 wandb.log(
                         {"Train Loss": loss.item(), 
                             "Train Accuracy": train_acc, 
@@ -269,47 +413,56 @@ def train_causal_sent(args):
                             "Model %Trainable": percent_trainable_params['trainable_model']
                         }, 
                         )
-                print(
-                    f"Epoch {epoch + 1}/{epochs}, "
-                    f"Batch {i + 1}/{len(train_loader)}, "
-                    f"Loss: {loss.item():.4f}, "
-                    f"Accuracy: {train_acc:.4f}, "
-                    f"F1: {train_f1:.4f}, "
-                    f"Tau_Hat_{args.treatment_phrase}: {tau_hat.item():.4f}, "
-                    f"Backbone %Trainable: {percent_trainable_params['trainable_backbone']}, "
-                    f"Model %Trainable: {percent_trainable_params['trainable_model']},"
-                )
+                if is_main:
+                    print(
+                        f"Epoch {epoch + 1}/{epochs}, "
+                        f"Batch {i + 1}/{len(train_loader)}, "
+                        f"Loss: {loss.item():.4f}, "
+                        f"Accuracy: {train_acc:.4f}, "
+                        f"F1: {train_f1:.4f}, "
+                        f"Tau_Hat_{args.treatment_phrase}: {tau_hat.item():.4f}, "
+                        f"Backbone %Trainable: {percent_trainable_params['trainable_backbone']}, "
+                        f"Model %Trainable: {percent_trainable_params['trainable_model']},"
+                    )
                 
         # ======= Validation Metrics (Log Every Epoch) =======
         model.eval()
-        val_targets, val_predictions = [], []
-        with torch.no_grad():
-            for batch in val_loader:
-                input_ids_real = batch['input_ids_real'].to(device)
-                attention_mask_real = batch['attention_mask_real'].to(device)
-                targets = batch['targets'].float().to(device)
-                
-                sentiment_output_real = model(input_ids_real, None, None, attention_mask_real, None, None)
-                preds = torch.sigmoid(sentiment_output_real).squeeze().cpu().numpy()
-                preds = (preds > 0.5).astype(int)
-                
-                val_targets.extend(targets.cpu().numpy())
-                val_predictions.extend(preds)
+        # frozen TorchScript inference path, rebuilt each epoch since freezing inlines the current weights
+        inference_model = None
+        if args.freeze_inference:
+            inference_model = model.build_frozen_inference_module(example_batch['input_ids_real'].to(device, non_blocking=True), 
+                                                                example_batch['attention_mask_real'].to(device, non_blocking=True))
+        val_targets, val_predictions = predict_sentiment(model=model, loader=val_loader, device=device, 
+                                                        inference_model=inference_model)
         
         # Compute validation metrics
         val_acc = accuracy_score(val_targets, val_predictions)
         val_f1 = f1_score(val_targets, val_predictions)
+        if distributed:
+            # every rank validates on the full set; use rank 0's result so early stopping agrees across ranks
+            val_acc_tensor = torch.tensor(val_acc, device=device)
+            torch.distributed.broadcast(val_acc_tensor, src=0)
+            val_acc = val_acc_tensor.item()
         wandb.log({"Val Accuracy": val_acc, "Val F1": val_f1, "Epoch": epoch + 1})
-        print(f"Epoch {epoch + 1}/{epochs} Validation Accuracy: {val_acc:.4f}, F1: {val_f1:.4f}")  
+        if is_main:
+            print(f"Epoch {epoch + 1}/{epochs} Validation Accuracy: {val_acc:.4f}, F1: {val_f1:.4f}")  
         
         # ==== Early Stopping and Checkpointing ====
-        if early_stopper.highest_val_acc(val_acc):
+        if early_stopper.highest_val_acc(val_acc) and is_main:
             model_path = os.path.join("out", f"experiment_{experiment_id}", "best_model.pt")
             save_model(model=model, optimizer=optimizer, args=args, filepath=model_path)
             save_model_weights_to_db(experiment_id=experiment_id, weight_path=model_path, project_name=project_name)
         if early_stopper.early_stop(val_acc):
             break
         # ==== end epoch ====
+    
+    # final outputs are computed and saved by rank 0 only
+    if distributed:
+        torch.distributed.destroy_process_group()
+        if not is_main:
+            return
+        # the training loader only covers this rank's shard
+        train_loader = DataLoader(ds_train, batch_size=batch_size, **loader_kwargs)
         
     best_model_path = os.path.join("out", f"experiment_{experiment_id}", "best_model.pt")
     best_model, _ = load_model_inference(best_model_path)
@@ -317,47 +470,9 @@ def train_causal_sent(args):
     
     # compute outputs for full training, val, and test sets at the end and save
     # as csvs with verbose model name to out/
-    train_targets, train_predictions = [], []
-    with torch.no_grad():
-        for batch in train_loader:
-            input_ids_real = batch['input_ids_real'].to(device)
-            attention_mask_real = batch['attention_mask_real'].to(device)
-            targets = batch['targets'].float().to(device)
-            
-            sentiment_output_real = model(input_ids_real, None, None, attention_mask_real, None, None)
-            preds = torch.sigmoid(sentiment_output_real).squeeze().cpu().numpy()
-            preds = (preds > 0.5).astype(int)
-            
-            train_targets.extend(targets.cpu().numpy())
-            train_predictions.extend(preds) 
-
-    val_targets, val_predictions = [], []
-    with torch.no_grad():
-        for batch in val_loader:
-            input_ids_real = batch['input_ids_real'].to(device)
-            attention_mask_real = batch['attention_mask_real'].to(device)
-            targets = batch['targets'].float().to(device)
-            
-            sentiment_output_real = model(input_ids_real, None, None, attention_mask_real, None, None)
-            preds = torch.sigmoid(sentiment_output_real).squeeze().cpu().numpy()
-            preds = (preds > 0.5).astype(int)
-            
-            val_targets.extend(targets.cpu().numpy())
-            val_predictions.extend(preds)
-
-    test_targets, test_predictions = [], []
-    with torch.no_grad():
-        for batch in test_loader:
-            input_ids_real = batch['input_ids_real'].to(device)
-            attention_mask_real = batch['attention_mask_real'].to(device)
-            targets = batch['targets'].float().to(device)
-            
-            sentiment_output_real = model(input_ids_real, None, None, attention_mask_real, None, None)
-            preds = torch.sigmoid(sentiment_output_real).squeeze().cpu().numpy()
-            preds = (preds > 0.5).astype(int)
-            
-            test_targets.extend(targets.cpu().numpy())
-            test_predictions.extend(preds)
+    train_targets, train_predictions = predict_sentiment(model=model, loader=train_loader, device=device)
+    val_targets, val_predictions = predict_sentiment(model=model, loader=val_loader, device=device)
+    test_targets, test_predictions = predict_sentiment(model=model, loader=test_loader, device=device)
     
     save_outputs_to_db(experiment_id=experiment_id, split="train", targets=train_targets, predictions=train_predictions, project_name=project_name)
     save_outputs_to_db(experiment_id=experiment_id, split="val", targets=val_targets, predictions=val_predictions, project_name=project_name)
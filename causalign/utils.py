@@ -96,10 +96,15 @@ def get_default_sent_training_args(regime: str):
         parser.add_argument("--riesz_head_type", type=str, default="fcn", help="Type of Riesz head to use. Options: 'fcn', 'linear', 'conv'")
         parser.add_argument("--seed", type=int, default=11711)
         parser.add_argument("--use_gpu", action='store_true', default = True)
-        parser.add_argument("--autocast", action='store_true', default = False)  # mixed precision training, only good on cuda
-        parser.add_argument("--num_workers", type=int, default=14)   # tune for your machine 
+        parser.add_argument("--autocast", action='store_true', default = False)  # mixed precision training, only good on cuda. Alias for --amp_dtype bf16
+        parser.add_argument("--amp_dtype", type=str, default="off", choices=['off', 'bf16', 'fp16'], help="Mixed precision dtype for the training forward/loss. 'fp16' also enables gradient scaling.")
+        parser.add_argument("--gradient_checkpointing", action=argparse.BooleanOptionalAction, default=True, help="Recompute backbone activations in backward to save memory. Disable with --no-gradient_checkpointing.")
+        parser.add_argument("--compile", action='store_true', default=False, help="torch.compile the training forward. Ignored while gradient checkpointing is enabled.")
+        parser.add_argument("--freeze_inference", action='store_true', default=False, help="Trace and torch.jit.freeze the sentiment inference path for the validation loop.")
+        parser.add_argument("--num_workers", type=int, default=max(2, (os.cpu_count() or 2) // 2))   # DataLoader workers per loader (and per rank under torchrun)
         parser.add_argument('--batch_size', type=int, default=16, help='Batch size for training')   # tune for your machine
         parser.add_argument('--lr', type=float, default=1e-5, help='Learning rate')
+        parser.add_argument("--optim", type=str, default="adamw", choices=['adamw', 'adamw8bit'], help="Optimizer. 'adamw8bit' uses bitsandbytes' 8-bit AdamW.")
         parser.add_argument('--epochs', type=int, default=20, help='Number of training epochs')
         # logging 
         parser.add_argument("--log_every", type=int, default=5, help='Log training progress every n batches') # TODO: Revert to >200 for faster training on big dataset
@@ -115,6 +120,7 @@ def get_default_sent_training_args(regime: str):
         # default data is loaded via huggingface. See dataset/utils.py for details for the IMDB, CivilComments data loading.
         parser.add_argument("--dataset", type=str, default="imdb") # choices=['imdb', 'civilcomments']
         parser.add_argument("--max_seq_length", type=int, default=100, help='Truncate texts to this number of tokens. Useful for faster training.')
+        parser.add_argument("--token_cache_dir", type=str, default=None, help='If set, save tokenized datasets here as .npy arrays and memory-map them on later runs instead of re-tokenizing.')
         parser.add_argument("--treated_only", action='store_true', default=False, help="Whether to train only on treated samples. Then estimates an ATE instead of an ATT.")
 
         if regime == 'causal_sent':
@@ -222,6 +228,19 @@ def process_unfreeze_param(unfreeze_param: str):
     else:
         raise ValueError(f"Unfreeze parameter {unfreeze_param} not recognized. Select one of 'top[n]', 'all', 'iterative'")
 
+def metrics_from_confusion_counts(tp: int, fp: int, fn: int, tn: int):
+    """
+    Compute binary accuracy and F1 from confusion counts. Matches sklearn's 
+    accuracy_score / f1_score, including F1 = 0 when there are no positives.
+    
+    Returns tuple of (accuracy, f1).
+    """
+    total = tp + fp + fn + tn
+    accuracy = (tp + tn) / total if total > 0 else 0.0
+    f1_denom = 2 * tp + fp + fn
+    f1 = (2 * tp) / f1_denom if f1_denom > 0 else 0.0
+    return accuracy, f1
+
 class EarlyStopper:
     def __init__(self, 
                 patience: int, 
@@ -398,9 +417,9 @@ def convert_to_native(obj):
     """
     if isinstance(obj, np.ndarray):
         return obj.tolist()
-    elif isinstance(obj, (np.float32, np.float64)):
+    elif isinstance(obj, np.floating):
         return float(obj)
-    elif isinstance(obj, (np.int32, np.int64)):
+    elif isinstance(obj, np.integer):
         return int(obj)
     elif isinstance(obj, dict):
         return {k: convert_to_native(v) for k, v in obj.items()}